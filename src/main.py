@@ -7,13 +7,41 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import orjson
 from flask import Flask, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from src.models.user import db
 from src.routes.api import api_bp
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider that uses orjson for faster encoding of API responses
+    """
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+app.json = OrjsonProvider(app)
+
+# Match routes with or without a trailing slash instead of redirecting
+app.url_map.strict_slashes = False
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
+# Limit request size; Werkzeug spools uploaded files above 500 KB to a
+# temporary file on disk, so uploads are never held in memory in full
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', '500')) * 1024 * 1024
+
+# Let the front-end web server send output files instead of Python.
+# Apache (mod_xsendfile): set USE_X_SENDFILE=True.
+# nginx: set OUTPUT_ACCEL_REDIRECT_PREFIX=/internal/outputs/ with
+#     location /internal/outputs/ { internal; alias <output folder>/; }
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', 'False').lower() == 'true'
+app.config['OUTPUT_ACCEL_REDIRECT_PREFIX'] = os.environ.get('OUTPUT_ACCEL_REDIRECT_PREFIX', '')
+
 # Register API blueprint
 app.register_blueprint(api_bp, url_prefix='/api')
 
@@ -6,6 +6,7 @@ Handles audio processing and transcription
 import os
 import json
 import time
+import hashlib
 import tempfile
 from datetime import datetime
 import speech_recognition as sr
@@ -13,6 +14,8 @@ from pydub import AudioSegment
 from pydub.silence import split_on_silence, detect_nonsilent
 import numpy as np
 
+from src.models.transcription.kernels import rank_segments, jaccard_scores, pack_word_sets
+
 class AudioProcessor:
     """
     Handles audio processing and transcription for the web application
@@ -59,6 +62,28 @@ class AudioProcessor:
         
         return file_path
     
+    def save_audio_stream(self, stream, buffer_size=1 << 20):
+        """
+        Save audio from a file-like stream without loading it into memory,
+        hashing the content in the same pass
+        
+        Args:
+            stream: Readable binary stream (e.g. an uploaded file's stream)
+            buffer_size (int): Size of the copy buffer in bytes
+        
+        Returns:
+            tuple: (path to the saved audio file, BLAKE2b hex digest of the content)
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        
+        with tempfile.NamedTemporaryFile(delete=False, dir=self.upload_folder,
+                                         prefix="recording_", suffix=".wav") as f:
+            for chunk in iter(lambda: stream.read(buffer_size), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        
+        return f.name, digest.hexdigest()
+    
     def transcribe_audio(self, audio_file):
         """
         Transcribe the audio file to text
@@ -131,6 +156,18 @@ class AudioProcessor:
                 "full_transcript": " ".join([segment["text"] for segment in transcript_segments])
             }
             
+        except FileNotFoundError as e:
+            # pydub raises this too when ffmpeg/ffprobe is missing
+            if e.filename != audio_file:
+                return {
+                    "success": False,
+                    "error": str(e)
+                }
+            
+            return {
+                "success": False,
+                "error": "Audio file not found"
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -157,35 +194,42 @@ class AudioProcessor:
         # Adjust segment selection based on sensitivity
         # Higher sensitivity means more segments (lower threshold for inclusion)
         min_duration_ms = 1000 * (1.0 - sensitivity)  # 0-1000ms based on sensitivity
-        filtered_segments = [s for s in segments if s["duration_ms"] >= min_duration_ms]
+        
+        count = len(segments)
+        starts = np.fromiter((s["start_ms"] for s in segments), dtype=np.float64, count=count)
+        durations = np.fromiter((s["duration_ms"] for s in segments), dtype=np.float64, count=count)
+        scores = np.zeros(count, dtype=np.float64)
         
         # If we have a reference script and sort_by_relevance is True,
         # score segments based on relevance to the script
-        if reference_script and sort_by_relevance:
+        by_relevance = bool(reference_script and sort_by_relevance)
+        
+        if by_relevance:
             import re
             
             # Simple word-based relevance scoring
             script_words = set(re.findall(r'\b\w+\b', reference_script.lower()))
             
-            for segment in filtered_segments:
-                segment_words = set(re.findall(r'\b\w+\b', segment["text"].lower()))
-                
-                # Calculate Jaccard similarity
-                if script_words and segment_words:
-                    intersection = script_words.intersection(segment_words)
-                    union = script_words.union(segment_words)
-                    segment["relevance_score"] = len(intersection) / len(union)
-                else:
-                    segment["relevance_score"] = 0
+            # Only segments that pass the duration filter need scoring
+            segment_words = [
+                set(re.findall(r'\b\w+\b', segment["text"].lower()))
+                if durations[i] >= min_duration_ms else set()
+                for i, segment in enumerate(segments)
+            ]
             
-            # Sort by relevance score
-            filtered_segments.sort(key=lambda x: x["relevance_score"], reverse=True)
-        else:
-            # Sort by timestamp (chronological)
-            filtered_segments.sort(key=lambda x: x["start_ms"])
-        
-        # Limit to max_count
-        if max_count > 0:
-            filtered_segments = filtered_segments[:max_count]
-        
-        return filtered_segments
+            # Calculate Jaccard similarity
+            offsets, in_script = pack_word_sets(segment_words, script_words)
+            scores = jaccard_scores(offsets, in_script, len(script_words))
+        
+        # Filter, sort (by relevance or chronologically) and limit to max_count
+        ranked = rank_segments(starts, durations, scores, float(min_duration_ms),
+                               int(max_count), by_relevance)
+        
+        up_sots = []
+        for i in ranked:
+            segment = segments[i]
+            if by_relevance:
+                segment["relevance_score"] = float(scores[i])
+            up_sots.append(segment)
+        
+        return up_sots
@@ -0,0 +1,22 @@
+"""
+Ahead-of-time compilation of the numeric kernels for the Retro Transcription Web Tool
+
+Builds the retro_kernels extension module next to kernels.py, so the first
+request after startup does not pay Numba's JIT compilation cost. Run as part
+of the build:
+    python -m src.models.transcription.compile_kernels
+"""
+
+import os
+from numba.pycc import CC
+
+from src.models.transcription.kernels import _rank_segments, _jaccard_scores
+
+cc = CC('retro_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export('rank_segments', 'i8[:](f8[:], f8[:], f8[:], f8, i8, b1)')(_rank_segments)
+cc.export('jaccard_scores', 'f8[:](i8[:], b1[:], i8)')(_jaccard_scores)
+
+if __name__ == '__main__':
+    cc.compile()
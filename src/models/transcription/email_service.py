@@ -79,10 +79,6 @@ class EmailService:
             self.logger.error("Missing required parameters: recipient_email or edl_file_path")
             return {"success": False, "error": "Missing required parameters"}
         
-        if not os.path.exists(edl_file_path):
-            self.logger.error(f"EDL file not found: {edl_file_path}")
-            return {"success": False, "error": "EDL file not found"}
-        
         try:
             # Create message
             msg = MIMEMultipart()
@@ -101,8 +97,12 @@ class EmailService:
             msg.attach(MIMEText(body, 'plain'))
             
             # Add EDL attachment
-            with open(edl_file_path, 'rb') as file:
-                attachment = MIMEApplication(file.read(), Name=os.path.basename(edl_file_path))
+            try:
+                with open(edl_file_path, 'rb') as file:
+                    attachment = MIMEApplication(file.read(), Name=os.path.basename(edl_file_path))
+            except FileNotFoundError:
+                self.logger.error(f"EDL file not found: {edl_file_path}")
+                return {"success": False, "error": "EDL file not found"}
             
             attachment['Content-Disposition'] = f'attachment; filename="{os.path.basename(edl_file_path)}"'
             msg.attach(attachment)
@@ -110,12 +110,15 @@ class EmailService:
             # Add additional attachments if provided
             if additional_attachments:
                 for file_path in additional_attachments:
-                    if os.path.exists(file_path):
+                    try:
                         with open(file_path, 'rb') as file:
                             attachment = MIMEApplication(file.read(), Name=os.path.basename(file_path))
-                        
-                        attachment['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
-                        msg.attach(attachment)
+                    except FileNotFoundError:
+                        # Skip attachments that no longer exist
+                        continue
+                    
+                    attachment['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
+                    msg.attach(attachment)
             
             # Send email
             if self.config["smtp_server"] != "smtp.example.com" and self.config["username"]:
@@ -0,0 +1,100 @@
+"""
+File Reaper Module for the Retro Transcription Web Tool
+Handles cleanup of audio and output files left behind by expired sessions
+"""
+
+import os
+import time
+import threading
+import logging
+
+class FileReaper:
+    """
+    Periodically deletes files older than a maximum age from a set of folders,
+    so that uploads and outputs of expired sessions do not fill the disk.
+    Files that are still in use are kept regardless of their age.
+    """
+    
+    def __init__(self, folders, max_age=86400, interval=60, in_use=None):
+        """
+        Initialize the file reaper
+        
+        Args:
+            folders (list): Folders to clean up
+            max_age (int): Age in seconds after which files are deleted
+            interval (int): Seconds between cleanup runs
+            in_use (callable, optional): Returns the set of file paths that
+                are still in use and must not be deleted
+        """
+        self.folders = list(folders)
+        self.max_age = max_age
+        self.interval = interval
+        self.in_use = in_use
+        self.logger = logging.getLogger("FileReaper")
+        self._thread = None
+    
+    def reap(self):
+        """
+        Delete files that are older than max_age and no longer in use
+        
+        Returns:
+            int: Number of files deleted
+        """
+        cutoff = time.time() - self.max_age
+        expired = []
+        
+        for folder in self.folders:
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        expired.append(os.path.abspath(entry.path))
+                except FileNotFoundError:
+                    # Already removed by another worker
+                    pass
+        
+        # Only look up the files in use when there is something to delete
+        if expired and self.in_use is not None:
+            in_use = {os.path.abspath(path) for path in self.in_use()}
+            expired = [path for path in expired if path not in in_use]
+        
+        removed = 0
+        for path in expired:
+            try:
+                # Skip files that were reused since the scan
+                if os.stat(path).st_mtime >= cutoff:
+                    continue
+                
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # Already removed by another worker
+                pass
+        
+        return removed
+    
+    def _run(self):
+        """
+        Run cleanup in a loop
+        """
+        while True:
+            try:
+                removed = self.reap()
+                if removed:
+                    self.logger.info(f"Removed {removed} expired files")
+            except Exception as e:
+                self.logger.error(f"Error removing expired files: {str(e)}")
+            
+            time.sleep(self.interval)
+    
+    def start(self):
+        """
+        Start cleaning up in a background daemon thread
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="FileReaper", daemon=True)
+            self._thread.start()
@@ -0,0 +1,144 @@
+"""
+Kernels Module for the Retro Transcription Web Tool
+Handles compiled numeric kernels for segment ranking
+"""
+
+import numpy as np
+
+# Try to import numba for compiled kernels
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # Fallback to plain Python if numba is not available
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        """
+        No-op replacement for numba.njit
+        """
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+def _rank_segments(starts, durations, scores, min_duration, max_count, by_score):
+    """
+    Select and order segments for up-sot generation
+    
+    Args:
+        starts (ndarray): Segment start times in ms (float64)
+        durations (ndarray): Segment durations in ms (float64)
+        scores (ndarray): Segment relevance scores (float64)
+        min_duration (float): Minimum duration in ms for a segment to be included
+        max_count (int): Maximum number of segments to return (0 for all)
+        by_score (bool): Order by descending score instead of start time
+    
+    Returns:
+        ndarray: Indices of the selected segments, in order
+    """
+    n = starts.shape[0]
+    
+    # Keep segments that are long enough
+    keep = np.empty(n, dtype=np.int64)
+    count = 0
+    for i in range(n):
+        if durations[i] >= min_duration:
+            keep[count] = i
+            count += 1
+    keep = keep[:count]
+    
+    if by_score:
+        keys = -scores[keep]
+    else:
+        keys = starts[keep]
+    
+    # Limit to max_count with an O(n) selection instead of a full sort.
+    # Ties at the cut-off go to the earliest segments, as a stable sort would.
+    if max_count > 0 and count > max_count:
+        threshold = np.partition(keys, max_count - 1)[max_count - 1]
+        
+        below = 0
+        for i in range(count):
+            if keys[i] < threshold:
+                below += 1
+        ties = max_count - below
+        
+        selected = np.empty(max_count, dtype=np.int64)
+        m = 0
+        for i in range(count):
+            if keys[i] < threshold:
+                selected[m] = i
+                m += 1
+            elif keys[i] == threshold and ties > 0:
+                selected[m] = i
+                m += 1
+                ties -= 1
+        
+        keep = keep[selected]
+        keys = keys[selected]
+    
+    # Stable sort so that ties keep their original order
+    return keep[np.argsort(keys, kind='mergesort')]
+
+def _jaccard_scores(offsets, in_reference, reference_size):
+    """
+    Compute the Jaccard similarity of each segment's words to a reference
+    
+    Args:
+        offsets (ndarray): Start of each segment's words in in_reference,
+            followed by the total word count (int64, length n + 1)
+        in_reference (ndarray): For each unique word of each segment, whether
+            it occurs in the reference (bool)
+        reference_size (int): Number of unique words in the reference
+    
+    Returns:
+        ndarray: Jaccard similarity per segment (0 if either set is empty)
+    """
+    n = offsets.shape[0] - 1
+    scores = np.zeros(n, dtype=np.float64)
+    
+    for i in range(n):
+        size = offsets[i + 1] - offsets[i]
+        if size == 0 or reference_size == 0:
+            continue
+        
+        intersection = 0
+        for k in range(offsets[i], offsets[i + 1]):
+            if in_reference[k]:
+                intersection += 1
+        
+        scores[i] = intersection / (reference_size + size - intersection)
+    
+    return scores
+
+def pack_word_sets(word_sets, reference_words):
+    """
+    Flatten segment word sets into the arrays used by jaccard_scores
+    
+    Args:
+        word_sets (list): Set of unique words for each segment
+        reference_words (set): Unique words of the reference
+    
+    Returns:
+        tuple: (offsets, in_reference) arrays
+    """
+    offsets = np.zeros(len(word_sets) + 1, dtype=np.int64)
+    in_reference = []
+    
+    for i, words in enumerate(word_sets):
+        in_reference.extend(word in reference_words for word in words)
+        offsets[i + 1] = len(in_reference)
+    
+    return offsets, np.asarray(in_reference, dtype=np.bool_)
+
+# Prefer the ahead-of-time compiled kernels (see compile_kernels.py)
+try:
+    from src.models.transcription.retro_kernels import rank_segments, jaccard_scores
+except ImportError:
+    rank_segments = njit(cache=True, fastmath=True)(_rank_segments)
+    jaccard_scores = njit(cache=True)(_jaccard_scores)
+    
+    # Compile on import so the first request does not pay the JIT cost
+    _dummy = np.zeros(1, dtype=np.float64)
+    rank_segments(_dummy, _dummy, _dummy, 0.0, 0, False)
+    jaccard_scores(np.zeros(2, dtype=np.int64), np.zeros(0, dtype=np.bool_), 0)
@@ -10,6 +10,7 @@ import re
 from datetime import datetime
 from fpdf import FPDF
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 class OutputGenerator:
     """
@@ -220,7 +221,26 @@ class OutputGenerator:
                 "error": str(e)
             }
     
-    def generate_all_outputs(self, segments, source_file, formats=None, base_filename=None):
+    def _generate_one(self, fmt, segments, source_file, base_filename):
+        """
+        Generate a single output format
+        
+        Args:
+            fmt (str): Output format (txt, pdf or edl)
+            segments (list): List of transcript segments
+            source_file (str): Path or name of the source audio/video file
+            base_filename (str): Base filename for the output
+        
+        Returns:
+            dict: Result with file path and success status
+        """
+        if fmt == "txt":
+            return self.generate_txt_output(segments, base_filename)
+        if fmt == "pdf":
+            return self.generate_pdf_output(segments, base_filename)
+        return self.generate_edl_output(segments, source_file, base_filename)
+    
+    def generate_all_outputs(self, segments, source_file, formats=None, base_filename=None, parallel=True):
         """
         Generate all selected output formats
         
@@ -229,6 +249,7 @@ class OutputGenerator:
             source_file (str): Path or name of the source audio/video file
             formats (dict, optional): Dictionary of format selections (txt, pdf, edl)
             base_filename (str, optional): Base filename for all outputs
+            parallel (bool): Whether to generate the formats concurrently
         
         Returns:
             dict: Dictionary of generated file paths and success status
@@ -248,38 +269,31 @@ class OutputGenerator:
             "files": {}
         }
         
-        # Generate each selected format
-        if formats.get("txt", True):
-            txt_result = self.generate_txt_output(segments, base_filename)
-            if txt_result["success"]:
-                results["files"]["txt"] = {
-                    "path": txt_result["file_path"],
-                    "filename": txt_result["filename"]
-                }
-            else:
-                results["success"] = False
-                results["txt_error"] = txt_result["error"]
+        selected = [fmt for fmt in ("txt", "pdf", "edl") if formats.get(fmt, True)]
         
-        if formats.get("pdf", True):
-            pdf_result = self.generate_pdf_output(segments, base_filename)
-            if pdf_result["success"]:
-                results["files"]["pdf"] = {
-                    "path": pdf_result["file_path"],
-                    "filename": pdf_result["filename"]
+        # Generate each selected format
+        if parallel and len(selected) > 1:
+            with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+                futures = {
+                    fmt: executor.submit(self._generate_one, fmt, segments, source_file, base_filename)
+                    for fmt in selected
                 }
-            else:
-                results["success"] = False
-                results["pdf_error"] = pdf_result["error"]
+                format_results = {fmt: future.result() for fmt, future in futures.items()}
+        else:
+            format_results = {
+                fmt: self._generate_one(fmt, segments, source_file, base_filename)
+                for fmt in selected
+            }
         
-        if formats.get("edl", True):
-            edl_result = self.generate_edl_output(segments, source_file, base_filename)
-            if edl_result["success"]:
-                results["files"]["edl"] = {
-                    "path": edl_result["file_path"],
-                    "filename": edl_result["filename"]
+        for fmt in selected:
+            format_result = format_results[fmt]
+            if format_result["success"]:
+                results["files"][fmt] = {
+                    "path": format_result["file_path"],
+                    "filename": format_result["filename"]
                 }
             else:
                 results["success"] = False
-                results["edl_error"] = edl_result["error"]
+                results[f"{fmt}_error"] = format_result["error"]
         
         return results
@@ -25,6 +25,28 @@ class ParameterControls:
             "timecode": "00:00:00"  # Current timecode
         }
     
+    @classmethod
+    def merge(cls, current=None, updates=None):
+        """
+        Apply parameter updates on top of existing values without shared state
+        
+        Args:
+            current (dict, optional): Existing parameter values (defaults if omitted)
+            updates (dict, optional): Parameter values to validate and apply
+        
+        Returns:
+            dict: Merged parameter values
+        """
+        controls = cls()
+        
+        if current:
+            controls.parameters.update(current)
+        
+        if updates:
+            controls.set_parameters(updates)
+        
+        return controls.get_parameters()
+    
     def get_parameters(self):
         """
         Get the current parameter values
@@ -9,6 +9,9 @@ import json
 import difflib
 from datetime import datetime
 import tempfile
+import numpy as np
+
+from src.models.transcription.kernels import jaccard_scores, pack_word_sets
 
 class ScriptMatcher:
     """
@@ -35,6 +38,7 @@ class ScriptMatcher:
         
         self.reference_script = ""
         self.script_sentences = []
+        self.script_sentences_lower = []
         self.script_keywords = set()
         
         # Try to import nltk for better text processing
@@ -97,6 +101,7 @@ class ScriptMatcher:
             
             # Tokenize script into sentences
             self.script_sentences = self.tokenize_sentences(script_text)
+            self.script_sentences_lower = [sentence.lower() for sentence in self.script_sentences]
             
             # Extract keywords (excluding common stopwords)
             words = self.tokenize_words(script_text.lower())
@@ -118,6 +123,42 @@ class ScriptMatcher:
                 "error": str(e)
             }
     
+    def get_state(self):
+        """
+        Get the processed reference script state, using only plain types
+        so that it can be serialized
+        
+        Returns:
+            dict: Reference script, sentences and keywords (as a sorted list)
+        """
+        return {
+            "reference_script": self.reference_script,
+            "script_sentences": self.script_sentences,
+            "script_sentences_lower": self.script_sentences_lower,
+            "script_keywords": sorted(self.script_keywords)
+        }
+    
+    def load_state(self, state):
+        """
+        Restore a reference script state produced by get_state
+        
+        Args:
+            state (dict): Reference script state
+        
+        Returns:
+            dict: Result with success status
+        """
+        self.reference_script = state["reference_script"]
+        self.script_sentences = state["script_sentences"]
+        self.script_sentences_lower = state["script_sentences_lower"]
+        self.script_keywords = set(state["script_keywords"])
+        
+        return {
+            "success": True,
+            "sentence_count": len(self.script_sentences),
+            "keyword_count": len(self.script_keywords)
+        }
+    
     def match_transcript_segment(self, segment_text):
         """
         Match a transcript segment against the reference script
@@ -181,23 +222,67 @@ class ScriptMatcher:
         """
         Score multiple transcript segments against the reference script
         
+        Produces the same scores as match_transcript_segment, but computes
+        keyword overlap and sentence similarity for all segments at once and
+        combines them with array operations.
+        
         Args:
             segments (list): List of transcript segments
         
         Returns:
             list: Segments with added relevance scores
         """
-        scored_segments = []
+        scored_segments = [segment.copy() for segment in segments]
         
-        for segment in segments:
-            match_result = self.match_transcript_segment(segment["text"])
-            
-            # Add relevance score to segment
-            segment_copy = segment.copy()
-            segment_copy["relevance_score"] = match_result["relevance_score"]
-            segment_copy["matched_sentences"] = match_result["matched_sentences"]
-            
-            scored_segments.append(segment_copy)
+        if not scored_segments:
+            return scored_segments
+        
+        if not self.reference_script:
+            for segment in scored_segments:
+                segment["relevance_score"] = 0
+                segment["matched_sentences"] = []
+            return scored_segments
+        
+        count = len(scored_segments)
+        texts = [(segment["text"] or "").lower() for segment in scored_segments]
+        
+        # Keyword overlap (Jaccard similarity) for all segments
+        segment_keywords = [{word for word in self.tokenize_words(text)
+                             if word.isalnum() and word not in self.stopwords}
+                            for text in texts]
+        offsets, in_script = pack_word_sets(segment_keywords, self.script_keywords)
+        keyword_scores = jaccard_scores(offsets, in_script, len(self.script_keywords))
+        
+        # Sentence similarity matrix (segments x script sentences).
+        # Empty segments match nothing, as in match_transcript_segment.
+        non_empty = [(i, text) for i, text in enumerate(texts) if text]
+        similarity = np.zeros((count, len(self.script_sentences_lower)), dtype=np.float64)
+        matcher = difflib.SequenceMatcher(None)
+        for j, script_sentence in enumerate(self.script_sentences_lower):
+            # SequenceMatcher caches its analysis of the second sequence
+            matcher.set_seq2(script_sentence)
+            for i, text in non_empty:
+                matcher.set_seq1(text)
+                # The quick ratios are upper bounds, so skip pairs that cannot match
+                if matcher.real_quick_ratio() > 0.3 and matcher.quick_ratio() > 0.3:
+                    similarity[i, j] = matcher.ratio()
+        
+        # Combine scores: 60% keyword overlap, 40% best sentence match
+        matched = similarity > 0.3  # Threshold for considering a match
+        best_similarity = np.max(np.where(matched, similarity, 0.0), axis=1, initial=0.0)
+        relevance_scores = np.where(matched.any(axis=1),
+                                    (0.6 * keyword_scores) + (0.4 * best_similarity),
+                                    keyword_scores * 0.6)
+        
+        # Top 3 matched sentences per segment, best first
+        top_sentences = np.argsort(-similarity, axis=1, kind="stable")[:, :3]
+        
+        for i, segment in enumerate(scored_segments):
+            segment["relevance_score"] = float(relevance_scores[i])
+            segment["matched_sentences"] = [
+                {"text": self.script_sentences[j], "similarity": float(similarity[i, j])}
+                for j in top_sentences[i] if matched[i, j]
+            ]
         
         return scored_segments
     
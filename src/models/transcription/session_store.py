@@ -0,0 +1,337 @@
+"""
+Session Store Module for the Retro Transcription Web Tool
+Handles Redis-backed storage of transcription sessions
+"""
+
+import os
+import time
+import secrets
+from contextlib import contextmanager
+import msgpack
+import redis
+
+# Delete a lock only if it is still held by the caller's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Point an audio hash at a new file unless another client changed it since
+# it was read; returns the value the key holds afterwards
+CLAIM_AUDIO_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current == false or current == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return ARGV[2]
+end
+return current
+"""
+
+class SessionLockError(Exception):
+    """
+    Raised when a session lock cannot be acquired in time
+    """
+
+class SessionStore:
+    """
+    Handles storage of transcription sessions in Redis so that any
+    worker process can serve any request for a session.
+    
+    Small fields are kept in a Redis hash, while large payloads (see
+    BLOB_FIELDS) are kept under their own keys and only loaded on request.
+    Values are stored as MessagePack.
+    """
+
+    # Session fields stored under separate keys and loaded only when asked for
+    BLOB_FIELDS = ("transcription", "up_sots")
+
+    def __init__(self, client=None, ttl=3600, prefix="sess"):
+        """
+        Initialize the session store
+
+        Args:
+            client (redis.Redis, optional): Redis client to use
+            ttl (int): Session lifetime in seconds, refreshed on every read
+            prefix (str): Prefix for session keys
+        """
+        if client is None:
+            client = redis.Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+
+        self.redis = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._release_lock = self.redis.register_script(RELEASE_LOCK_SCRIPT)
+        self._claim_audio = self.redis.register_script(CLAIM_AUDIO_SCRIPT)
+
+    def _key(self, session_id):
+        """
+        Build the Redis key for a session
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            str: Redis key
+        """
+        return f"{self.prefix}:{session_id}"
+
+    def _blob_key(self, session_id, field):
+        """
+        Build the Redis key for a large session field
+
+        Args:
+            session_id (str): Session ID
+            field (str): Field name from BLOB_FIELDS
+
+        Returns:
+            str: Redis key
+        """
+        return f"{self.prefix}:{session_id}:{field}"
+
+    def _decode(self, fields, blobs, blob_data):
+        """
+        Build a session dict from a hash and blob values read from Redis
+
+        Args:
+            fields (dict): Raw hash fields
+            blobs (tuple): Names of the blob fields that were read
+            blob_data (list): Raw blob values, in the same order as blobs
+
+        Returns:
+            dict: Session data
+        """
+        session = {name.decode(): msgpack.unpackb(value, raw=False) for name, value in fields.items()}
+
+        for field, data in zip(blobs, blob_data):
+            if data is not None:
+                session[field] = msgpack.unpackb(data, raw=False)
+
+        return session
+
+    def _write(self, pipe, session_id, session, loaded_blobs, blob_data=None):
+        """
+        Queue the commands that write a session
+
+        Args:
+            pipe (redis.client.Pipeline): Pipeline to queue the commands on
+            session_id (str): Session ID
+            session (dict): Session data
+            loaded_blobs (tuple): Blob fields that were part of the data read,
+                which are deleted if the session no longer has them
+            blob_data (dict, optional): Raw blob values as read, by field;
+                blobs that still pack to the same bytes are not rewritten
+        """
+        blob_data = blob_data or {}
+        key = self._key(session_id)
+        fields = {name: msgpack.packb(value, use_bin_type=True)
+                  for name, value in session.items() if name not in self.BLOB_FIELDS}
+
+        pipe.delete(key)
+        if fields:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl)
+
+        for field in self.BLOB_FIELDS:
+            if field in session:
+                packed = msgpack.packb(session[field], use_bin_type=True)
+                if blob_data.get(field) == packed:
+                    # Unchanged, so only refresh the expiry
+                    pipe.expire(self._blob_key(session_id, field), self.ttl)
+                else:
+                    pipe.setex(self._blob_key(session_id, field), self.ttl, packed)
+            elif field in loaded_blobs:
+                pipe.delete(self._blob_key(session_id, field))
+
+    def exists(self, session_id):
+        """
+        Check whether a session exists
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            bool: True if the session exists
+        """
+        return bool(self.redis.exists(self._key(session_id)))
+
+    def get(self, session_id, blobs=()):
+        """
+        Get a session and refresh its expiry (sliding sessions)
+
+        Args:
+            session_id (str): Session ID
+            blobs (tuple): Large fields (from BLOB_FIELDS) to load as well
+
+        Returns:
+            dict: Session data, or None if the session does not exist
+        """
+        key = self._key(session_id)
+
+        # Read and refresh the TTLs in a single round trip
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(key)
+        if blobs:
+            pipe.mget([self._blob_key(session_id, field) for field in blobs])
+        pipe.expire(key, self.ttl)
+        for field in self.BLOB_FIELDS:
+            pipe.expire(self._blob_key(session_id, field), self.ttl)
+        results = pipe.execute()
+
+        if not results[0]:
+            return None
+
+        return self._decode(results[0], blobs, results[1] if blobs else [])
+
+    def save(self, session_id, session):
+        """
+        Save a session, replacing any existing data
+
+        Args:
+            session_id (str): Session ID
+            session (dict): Session data
+        """
+        pipe = self.redis.pipeline()
+        self._write(pipe, session_id, session, self.BLOB_FIELDS)
+        pipe.execute()
+
+    def update(self, session_id, updater, blobs=()):
+        """
+        Apply a read-modify-write to a session with optimistic locking
+
+        The updater is called with the current session dict and mutates it
+        in place. Large fields are only present if listed in blobs, but the
+        updater may set any of them. If another client writes the session
+        between the read and the write, the update is retried against the
+        fresh data.
+
+        Args:
+            session_id (str): Session ID
+            updater (callable): Function that mutates the session dict
+            blobs (tuple): Large fields (from BLOB_FIELDS) to load as well
+
+        Returns:
+            dict: Updated session data, or None if the session does not exist
+        """
+        key = self._key(session_id)
+        blob_keys = [self._blob_key(session_id, field) for field in self.BLOB_FIELDS]
+
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key, *blob_keys)
+
+                    fields = pipe.hgetall(key)
+                    if not fields:
+                        pipe.unwatch()
+                        return None
+
+                    blob_data = pipe.mget([self._blob_key(session_id, field) for field in blobs]) if blobs else []
+                    session = self._decode(fields, blobs, blob_data)
+                    updater(session)
+
+                    pipe.multi()
+                    self._write(pipe, session_id, session, blobs, dict(zip(blobs, blob_data)))
+                    pipe.execute()
+
+                    return session
+                except redis.WatchError:
+                    # Session changed underneath us, retry with fresh data
+                    continue
+
+    def claim_audio(self, audio_digest, file_path, ttl=86400):
+        """
+        Find the stored file for an uploaded audio file's content, so that
+        sessions with identical audio can share one file on disk
+
+        If no stored file with the same content remains, file_path becomes
+        the stored file for this content.
+
+        Args:
+            audio_digest (str): Hash of the audio content
+            file_path (str): Path of the newly saved audio file
+            ttl (int): Seconds to remember the audio hash
+
+        Returns:
+            str: Path of the stored file with this content (file_path if the
+                new file was claimed)
+        """
+        key = f"audio:{audio_digest}"
+
+        if self.redis.set(key, file_path, nx=True, ex=ttl):
+            return file_path
+
+        seen = self.redis.get(key) or b""
+        while True:
+            if seen:
+                stored_path = seen.decode()
+                try:
+                    # Refresh the modification time so the file reaper keeps it
+                    os.utime(stored_path)
+                    return stored_path
+                except FileNotFoundError:
+                    # Already cleaned up, replace it with the new file
+                    pass
+
+            current = self._claim_audio(keys=[key], args=[seen, file_path, ttl])
+            if current.decode() == file_path:
+                return file_path
+
+            # Another upload claimed the hash in the meantime
+            seen = current
+
+    def referenced_files(self):
+        """
+        Collect the audio and output files referenced by live sessions
+
+        Returns:
+            set: File paths
+        """
+        paths = set()
+
+        for key in self.redis.scan_iter(match=f"{self.prefix}:*", count=500, _type="hash"):
+            audio_file, outputs = self.redis.hmget(key, "audio_file", "outputs")
+            if audio_file is not None:
+                paths.add(msgpack.unpackb(audio_file, raw=False))
+            if outputs is not None:
+                paths.update(info["path"] for info in msgpack.unpackb(outputs, raw=False).values())
+
+        return paths
+
+    def delete(self, session_id):
+        """
+        Delete a session
+
+        Args:
+            session_id (str): Session ID
+        """
+        self.redis.delete(self._key(session_id),
+                          *[self._blob_key(session_id, field) for field in self.BLOB_FIELDS])
+
+    @contextmanager
+    def lock(self, session_id, timeout=10, blocking_timeout=5):
+        """
+        Hold an exclusive lock on a session across workers
+
+        Args:
+            session_id (str): Session ID
+            timeout (int): Seconds after which the lock expires if not released
+            blocking_timeout (float): Seconds to wait for the lock
+
+        Raises:
+            SessionLockError: If the lock could not be acquired in time
+        """
+        key = f"lock:{self._key(session_id)}"
+        token = secrets.token_hex(8)
+        deadline = time.monotonic() + blocking_timeout
+
+        while not self.redis.set(key, token, nx=True, ex=timeout):
+            if time.monotonic() >= deadline:
+                raise SessionLockError(f"Session {session_id} is locked")
+            time.sleep(0.05)
+
+        try:
+            yield
+        finally:
+            self._release_lock(keys=[key], args=[token])
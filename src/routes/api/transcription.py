@@ -2,19 +2,29 @@
 API routes for transcription functionality
 """
 
-from flask import Blueprint, request, jsonify, current_app, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import copy
+import mimetypes
+import hashlib
 import json
 import time
-from datetime import datetime
 import tempfile
-import uuid
+import secrets
+import msgpack
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
 
 from src.models.transcription.audio_processor import AudioProcessor
 from src.models.transcription.output_generator import OutputGenerator
 from src.models.transcription.script_matcher import ScriptMatcher
 from src.models.transcription.parameter_controls import ParameterControls
-from src.models.transcription.email_service import EmailService
+from src.models.transcription.session_store import SessionStore, SessionLockError
+from src.models.transcription.file_reaper import FileReaper
+from src.workers import redis_connection, transcription_queue, email_queue
+from src.workers.transcribe import run_transcription, mark_transcription_failed
+from src.workers.send_email import send_email_job
 
 # Create blueprint
 transcription_bp = Blueprint('transcription', __name__)
@@ -23,11 +33,83 @@ transcription_bp = Blueprint('transcription', __name__)
 audio_processor = AudioProcessor()
 output_generator = OutputGenerator()
 script_matcher = ScriptMatcher()
-parameter_controls = ParameterControls()
-email_service = EmailService()
 
-# Session storage (in-memory for development)
-sessions = {}
+# Session storage (shared across workers)
+session_store = SessionStore(redis_connection)
+
+# Remove old uploads and outputs once no live session refers to them
+file_reaper = FileReaper(
+    [audio_processor.upload_folder, output_generator.output_folder, script_matcher.scripts_folder],
+    max_age=int(os.environ.get('FILE_RETENTION_SECONDS', '86400')),
+    in_use=session_store.referenced_files
+)
+
+@transcription_bp.record_once
+def start_file_reaper(state):
+    """
+    Start the file reaper when the blueprint is registered on an app
+    """
+    file_reaper.start()
+
+# Transcription runs one recognition request per chunk, so allow long recordings
+TRANSCRIPTION_JOB_TIMEOUT = int(os.environ.get('TRANSCRIPTION_JOB_TIMEOUT', '1800'))
+
+# Large session fields that session-info returns only on request
+SESSION_INFO_BLOBS = {
+    'transcript': 'transcription',
+    'upsots': 'up_sots'
+}
+
+# Last formatted timestamp as (second, ISO string)
+_iso_cache = (None, None)
+
+def iso_now():
+    """
+    Get the current local time as an ISO 8601 string (second precision)
+    
+    The formatted string is reused until the wall-clock second changes.
+    
+    Returns:
+        str: Current timestamp
+    """
+    global _iso_cache
+    
+    second = int(time.time())
+    cached_second, formatted = _iso_cache
+    if cached_second != second:
+        formatted = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second))
+        _iso_cache = (second, formatted)
+    
+    return formatted
+
+def load_reference_script(script_text):
+    """
+    Build a script matcher for a reference script, reusing processed
+    script state cached in Redis for scripts that have been seen before
+    
+    Each request gets its own shallow copy of the shared matcher, which
+    shares the tokenizers and stopwords but has its own script state, so
+    concurrent requests for different sessions never see each other's script.
+    
+    Args:
+        script_text (str): The reference script text
+    
+    Returns:
+        tuple: (script digest, script matcher, result with success status)
+    """
+    script_digest = hashlib.blake2b(script_text.encode(), digest_size=16).hexdigest()
+    matcher = copy.copy(script_matcher)
+    
+    cache_key = f"script-state:{script_digest}"
+    cached_state = redis_connection.get(cache_key)
+    if cached_state is not None:
+        return script_digest, matcher, matcher.load_state(msgpack.unpackb(cached_state, raw=False))
+    
+    result = matcher.set_reference_script(script_text)
+    if result['success']:
+        redis_connection.setex(cache_key, 86400, msgpack.packb(matcher.get_state(), use_bin_type=True))
+    
+    return script_digest, matcher, result
 
 @transcription_bp.route('/upload-audio', methods=['POST'])
 def upload_audio():
@@ -46,19 +128,24 @@ def upload_audio():
             return jsonify({'success': False, 'error': 'Empty filename'}), 400
         
         # Generate session ID
-        session_id = str(uuid.uuid4())
+        session_id = secrets.token_hex(16)
         
         # Save audio file
-        audio_data = audio_file.read()
-        file_path = audio_processor.save_audio_file(audio_data)
+        file_path, audio_digest = audio_processor.save_audio_stream(audio_file.stream)
+        
+        # Share the stored file of an identical earlier upload
+        stored_path = session_store.claim_audio(audio_digest, file_path)
+        if stored_path != file_path:
+            os.remove(file_path)
+            file_path = stored_path
         
         # Store session data
-        sessions[session_id] = {
+        session_store.save(session_id, {
             'audio_file': file_path,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': iso_now(),
             'status': 'uploaded',
-            'parameters': parameter_controls.get_parameters()
-        }
+            'parameters': ParameterControls.merge()
+        })
         
         return jsonify({
             'success': True, 
@@ -66,6 +153,8 @@ def upload_audio():
             'message': 'Audio uploaded successfully'
         })
         
+    except RequestEntityTooLarge:
+        return jsonify({'success': False, 'error': 'Audio file is too large'}), 413
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -79,21 +168,27 @@ def record_audio():
         if 'audio_data' not in request.files:
             return jsonify({'success': False, 'error': 'No audio data provided'}), 400
         
-        audio_data = request.files['audio_data'].read()
+        audio_file = request.files['audio_data']
         
         # Generate session ID
-        session_id = str(uuid.uuid4())
+        session_id = secrets.token_hex(16)
         
         # Save audio file
-        file_path = audio_processor.save_audio_file(audio_data)
+        file_path, audio_digest = audio_processor.save_audio_stream(audio_file.stream)
+        
+        # Share the stored file of an identical earlier upload
+        stored_path = session_store.claim_audio(audio_digest, file_path)
+        if stored_path != file_path:
+            os.remove(file_path)
+            file_path = stored_path
         
         # Store session data
-        sessions[session_id] = {
+        session_store.save(session_id, {
             'audio_file': file_path,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': iso_now(),
             'status': 'recorded',
-            'parameters': parameter_controls.get_parameters()
-        }
+            'parameters': ParameterControls.merge()
+        })
         
         return jsonify({
             'success': True, 
@@ -101,61 +196,56 @@ def record_audio():
             'message': 'Audio recorded successfully'
         })
         
+    except RequestEntityTooLarge:
+        return jsonify({'success': False, 'error': 'Audio file is too large'}), 413
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @transcription_bp.route('/transcribe/<session_id>', methods=['POST'])
 def transcribe(session_id):
     """
-    Transcribe audio for a given session
+    Queue transcription of the audio for a given session
     """
     try:
         # Check if session exists
-        if session_id not in sessions:
+        session = session_store.get(session_id)
+        if session is None:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        session = sessions[session_id]
-        
-        # Check if audio file exists
-        if 'audio_file' not in session or not os.path.exists(session['audio_file']):
+        # Check if audio file exists (a missing file is reported by the worker)
+        if 'audio_file' not in session:
             return jsonify({'success': False, 'error': 'Audio file not found'}), 404
         
-        # Update parameters if provided
-        if request.json and 'parameters' in request.json:
-            parameter_controls.set_parameters(request.json['parameters'])
-            session['parameters'] = parameter_controls.get_parameters()
-        
-        # Transcribe audio
-        result = audio_processor.transcribe_audio(session['audio_file'])
-        
-        if not result['success']:
-            return jsonify({'success': False, 'error': result.get('error', 'Transcription failed')}), 500
-        
-        # Store transcription results
-        session['transcription'] = result
-        session['status'] = 'transcribed'
-        
-        # Get up-sots based on parameters
-        params = session['parameters']
-        up_sots = audio_processor.get_up_sots(
-            result['segments'],
-            max_count=params['up_sots_count'],
-            sensitivity=params['sensitivity'],
-            sort_by_relevance=params['sort_by_relevance'],
-            reference_script=session.get('script', '')
+        # Mark as queued before enqueueing so the worker's status always wins
+        def mark_queued(current):
+            # Update parameters if provided
+            if request.json and 'parameters' in request.json:
+                current['parameters'] = ParameterControls.merge(current['parameters'], request.json['parameters'])
+            current['status'] = 'queued'
+            current.pop('error', None)
+        
+        if session_store.update(session_id, mark_queued) is None:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
+        
+        # Hand transcription off to a background worker
+        job = transcription_queue.enqueue(
+            run_transcription,
+            session_id,
+            job_timeout=TRANSCRIPTION_JOB_TIMEOUT,
+            on_failure=mark_transcription_failed
         )
         
-        # Store up-sots
-        session['up_sots'] = up_sots
+        def store_job_id(current):
+            current['job_id'] = job.id
+        
+        session_store.update(session_id, store_job_id)
         
         return jsonify({
             'success': True,
             'session_id': session_id,
-            'segments_count': len(result['segments']),
-            'up_sots_count': len(up_sots),
-            'up_sots': up_sots,
-            'full_transcript': result['full_transcript']
-        })
+            'job_id': job.id,
+            'status': 'queued'
+        }), 202
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -167,35 +257,41 @@ def set_parameters(session_id):
     """
     try:
         # Check if session exists
-        if session_id not in sessions:
+        if not session_store.exists(session_id):
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
         # Check if parameters are provided
         if not request.json:
             return jsonify({'success': False, 'error': 'No parameters provided'}), 400
         
-        # Update parameters
-        updated_params = parameter_controls.set_parameters(request.json)
-        sessions[session_id]['parameters'] = updated_params
-        
-        # Update up-sots if transcription exists
-        if 'transcription' in sessions[session_id] and sessions[session_id]['transcription'].get('success', False):
-            segments = sessions[session_id]['transcription']['segments']
-            
-            up_sots = audio_processor.get_up_sots(
-                segments,
-                max_count=updated_params['up_sots_count'],
-                sensitivity=updated_params['sensitivity'],
-                sort_by_relevance=updated_params['sort_by_relevance'],
-                reference_script=sessions[session_id].get('script', '')
-            )
-            
-            sessions[session_id]['up_sots'] = up_sots
+        def apply_parameters(session):
+            # Update parameters on top of this session's current values
+            updated_params = ParameterControls.merge(session['parameters'], request.json)
+            session['parameters'] = updated_params
             
+            # Update up-sots if transcription exists
+            if 'transcription' in session and session['transcription'].get('success', False):
+                session['up_sots'] = audio_processor.get_up_sots(
+                    session['transcription']['segments'],
+                    max_count=updated_params['up_sots_count'],
+                    sensitivity=updated_params['sensitivity'],
+                    sort_by_relevance=updated_params['sort_by_relevance'],
+                    reference_script=session.get('script', '')
+                )
+                session['up_sots_count'] = len(session['up_sots'])
+                session.pop('up_sots_script_digest', None)
+        
+        session = session_store.update(session_id, apply_parameters, blobs=('transcription',))
+        if session is None:
+            return jsonify({'success': False, 'error': 'Session not found'}), 404
+        
+        updated_params = session['parameters']
+        
+        if 'transcription' in session and session['transcription'].get('success', False):
             return jsonify({
                 'success': True,
                 'parameters': updated_params,
-                'up_sots': up_sots
+                'up_sots': session['up_sots']
             })
         
         return jsonify({
@@ -213,7 +309,7 @@ def set_script(session_id):
     """
     try:
         # Check if session exists
-        if session_id not in sessions:
+        if not session_store.exists(session_id):
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
         # Check if script is provided
@@ -222,41 +318,64 @@ def set_script(session_id):
         
         script_text = request.json['script']
         
-        # Set script in script matcher
-        result = script_matcher.set_reference_script(script_text)
-        
-        if not result['success']:
-            return jsonify({'success': False, 'error': result.get('error', 'Failed to set script')}), 500
-        
-        # Store script in session
-        sessions[session_id]['script'] = script_text
-        
-        # Update up-sots if transcription exists and sort by relevance is enabled
-        if ('transcription' in sessions[session_id] and 
-            sessions[session_id]['transcription'].get('success', False) and
-            sessions[session_id]['parameters']['sort_by_relevance']):
+        # Serialize changes to this session across workers
+        with session_store.lock(session_id):
+            # Set script in a script matcher for this request
+            script_digest, matcher, result = load_reference_script(script_text)
+            
+            if not result['success']:
+                return jsonify({'success': False, 'error': result.get('error', 'Failed to set script')}), 500
             
-            segments = sessions[session_id]['transcription']['segments']
+            session = session_store.get(session_id)
+            if session is None:
+                return jsonify({'success': False, 'error': 'Session not found'}), 404
             
-            # Score segments based on script
-            scored_segments = script_matcher.score_transcript_segments(segments)
+            # Up-sots already scored against this exact script need no rescoring
+            if session.get('up_sots_script_digest') == script_digest:
+                return jsonify({
+                    'success': True,
+                    'script_info': result
+                })
             
-            # Get up-sots based on parameters
-            params = sessions[session_id]['parameters']
-            up_sots = audio_processor.get_up_sots(
-                scored_segments,
-                max_count=params['up_sots_count'],
-                sensitivity=params['sensitivity'],
-                sort_by_relevance=True,
-                reference_script=script_text
-            )
+            rescored = {}
             
-            sessions[session_id]['up_sots'] = up_sots
+            def apply_script(session):
+                # Store script in session
+                session['script'] = script_text
+                rescored['up_sots'] = False
+                
+                # Update up-sots if transcription exists and sort by relevance is enabled
+                if ('transcription' in session and 
+                    session['transcription'].get('success', False) and
+                    session['parameters']['sort_by_relevance']):
+                    
+                    segments = session['transcription']['segments']
+                    
+                    # Score segments based on script
+                    scored_segments = matcher.score_transcript_segments(segments)
+                    
+                    # Get up-sots based on parameters
+                    params = session['parameters']
+                    session['up_sots'] = audio_processor.get_up_sots(
+                        scored_segments,
+                        max_count=params['up_sots_count'],
+                        sensitivity=params['sensitivity'],
+                        sort_by_relevance=True,
+                        reference_script=script_text
+                    )
+                    session['up_sots_count'] = len(session['up_sots'])
+                    session['up_sots_script_digest'] = script_digest
+                    rescored['up_sots'] = True
             
+            session = session_store.update(session_id, apply_script, blobs=('transcription',))
+            if session is None:
+                return jsonify({'success': False, 'error': 'Session not found'}), 404
+        
+        if rescored['up_sots']:
             return jsonify({
                 'success': True,
                 'script_info': result,
-                'up_sots': up_sots
+                'up_sots': session['up_sots']
             })
         
         return jsonify({
@@ -264,6 +383,8 @@ def set_script(session_id):
             'script_info': result
         })
         
+    except SessionLockError:
+        return jsonify({'success': False, 'error': 'Session is busy, please retry'}), 409
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -274,11 +395,10 @@ def generate_output(session_id):
     """
     try:
         # Check if session exists
-        if session_id not in sessions:
+        session = session_store.get(session_id, blobs=('up_sots',))
+        if session is None:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        session = sessions[session_id]
-        
         # Check if up-sots exist
         if 'up_sots' not in session or not session['up_sots']:
             return jsonify({'success': False, 'error': 'No up-sots available'}), 400
@@ -287,7 +407,7 @@ def generate_output(session_id):
         formats = request.json.get('formats', {'txt': True, 'pdf': True, 'edl': True})
         
         # Generate timestamp for filenames
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
         base_filename = f"transcript_{timestamp}"
         
         # Generate outputs
@@ -302,7 +422,10 @@ def generate_output(session_id):
             return jsonify({'success': False, 'error': 'Failed to generate outputs'}), 500
         
         # Store output files in session
-        session['outputs'] = results['files']
+        def store_outputs(current):
+            current['outputs'] = results['files']
+        
+        session_store.update(session_id, store_outputs)
         
         # Prepare response with download URLs
         download_urls = {}
@@ -325,11 +448,10 @@ def download_output(session_id, format):
     """
     try:
         # Check if session exists
-        if session_id not in sessions:
+        session = session_store.get(session_id)
+        if session is None:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        session = sessions[session_id]
-        
         # Check if outputs exist
         if 'outputs' not in session or not session['outputs']:
             return jsonify({'success': False, 'error': 'No outputs available'}), 400
@@ -341,17 +463,26 @@ def download_output(session_id, format):
         file_info = session['outputs'][format]
         file_path = file_info['path']
         
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return jsonify({'success': False, 'error': 'Output file not found'}), 404
+        # Let nginx serve the file if it is configured to
+        accel_prefix = current_app.config.get('OUTPUT_ACCEL_REDIRECT_PREFIX')
+        if accel_prefix:
+            relative_path = os.path.relpath(file_path, output_generator.output_folder)
+            mimetype = mimetypes.guess_type(file_info['filename'])[0] or 'application/octet-stream'
+            
+            response = Response(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path
+            response.headers['Content-Disposition'] = f'attachment; filename="{file_info["filename"]}"'
+            return response
         
-        # Send file
+        # Send file (uses X-Sendfile when USE_X_SENDFILE is enabled)
         return send_file(
             file_path,
             as_attachment=True,
             download_name=file_info['filename']
         )
         
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Output file not found'}), 404
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -362,11 +493,10 @@ def send_email(session_id):
     """
     try:
         # Check if session exists
-        if session_id not in sessions:
+        session = session_store.get(session_id)
+        if session is None:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        session = sessions[session_id]
-        
         # Check if outputs exist
         if 'outputs' not in session or not session['outputs']:
             return jsonify({'success': False, 'error': 'No outputs available'}), 400
@@ -377,39 +507,26 @@ def send_email(session_id):
         
         recipient_email = request.json['email']
         
-        # Get EDL file path
+        # Check if EDL output exists
         if 'edl' not in session['outputs']:
             return jsonify({'success': False, 'error': 'No EDL output available'}), 400
         
-        edl_file_path = session['outputs']['edl']['path']
-        
-        # Get additional attachments
-        additional_attachments = []
-        if request.json.get('include_txt', False) and 'txt' in session['outputs']:
-            additional_attachments.append(session['outputs']['txt']['path'])
-        
-        if request.json.get('include_pdf', False) and 'pdf' in session['outputs']:
-            additional_attachments.append(session['outputs']['pdf']['path'])
-        
-        # Send email
-        result = email_service.send_edl(
-            recipient_email=recipient_email,
-            edl_file_path=edl_file_path,
-            subject=request.json.get('subject', 'EDL File from Retro Transcription Tool'),
-            body=request.json.get('body', 'Please find attached the EDL file generated from your recording.'),
-            additional_attachments=additional_attachments
+        # Hand sending off to a background worker
+        job = email_queue.enqueue(
+            send_email_job,
+            session_id,
+            recipient_email,
+            request.json.get('subject', 'EDL File from Retro Transcription Tool'),
+            request.json.get('body', 'Please find attached the EDL file generated from your recording.'),
+            include_txt=request.json.get('include_txt', False),
+            include_pdf=request.json.get('include_pdf', False)
         )
         
-        if not result['success']:
-            return jsonify({'success': False, 'error': result.get('error', 'Failed to send email')}), 500
-        
-        # Store email result in session
-        session['email_sent'] = result
-        
         return jsonify({
             'success': True,
-            'email_result': result
-        })
+            'queued': True,
+            'job_id': job.id
+        }), 202
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -418,14 +535,20 @@ def send_email(session_id):
 def session_info(session_id):
     """
     Get information about a session
+    
+    Large fields are only returned when requested, e.g.
+    ?include=transcript,upsots
     """
     try:
+        # Only load the large fields that were asked for
+        include = request.args.get('include', '').split(',')
+        blobs = tuple(field for name, field in SESSION_INFO_BLOBS.items() if name in include)
+        
         # Check if session exists
-        if session_id not in sessions:
+        session = session_store.get(session_id, blobs=blobs)
+        if session is None:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
         
-        session = sessions[session_id]
-        
         # Prepare safe session info (exclude file paths)
         safe_info = {
             'session_id': session_id,
@@ -434,17 +557,36 @@ def session_info(session_id):
             'parameters': session['parameters']
         }
         
+        if 'job_id' in session:
+            safe_info['job_id'] = session['job_id']
+            try:
+                job = Job.fetch(session['job_id'], connection=redis_connection)
+                safe_info['job_status'] = job.get_status()
+            except NoSuchJobError:
+                # Finished jobs expire from the queue; the session status remains
+                pass
+        
+        if 'error' in session:
+            safe_info['error'] = session['error']
+        
+        if 'segments_count' in session:
+            safe_info['segments_count'] = session['segments_count']
+        
         if 'transcription' in session and session['transcription'].get('success', False):
-            safe_info['segments_count'] = len(session['transcription']['segments'])
             safe_info['full_transcript'] = session['transcription']['full_transcript']
         
+        if 'up_sots_count' in session:
+            safe_info['up_sots_count'] = session['up_sots_count']
+        
         if 'up_sots' in session:
-            safe_info['up_sots_count'] = len(session['up_sots'])
             safe_info['up_sots'] = session['up_sots']
         
         if 'outputs' in session:
             safe_info['available_formats'] = list(session['outputs'].keys())
         
+        if 'email_error' in session:
+            safe_info['email_error'] = session['email_error']
+        
         if 'email_sent' in session:
             safe_info['email_sent'] = {
                 'timestamp': session['email_sent'].get('timestamp'),
@@ -452,10 +594,14 @@ def session_info(session_id):
                 'simulated': session['email_sent'].get('simulated', False)
             }
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'session': safe_info
         })
         
+        # Let polling clients revalidate with If-None-Match and get 304s
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=8).hexdigest())
+        return response.make_conditional(request)
+        
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
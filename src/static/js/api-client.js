@@ -107,8 +107,9 @@ class ApiClient {
             const response = await fetch(`${this.baseUrl}/api/transcription/transcribe/${this.sessionId}`, options);
             
             // Improved error handling for JSON parsing
+            let result;
             try {
-                return await response.json();
+                result = await response.json();
             } catch (jsonError) {
                 console.error('Error parsing JSON response:', jsonError);
                 return { 
@@ -116,12 +117,54 @@ class ApiClient {
                     error: 'Invalid server response format. Please try again.' 
                 };
             }
+
+            // Transcription runs in a background worker; wait for it to finish
+            if (result.success && result.job_id) {
+                return await this.waitForTranscription();
+            }
+
+            return result;
         } catch (error) {
             console.error('Error transcribing audio:', error);
             return { success: false, error: error.message };
         }
     }
 
+    /**
+     * Poll session info until the queued transcription completes
+     * @param {number} interval - Polling interval in milliseconds
+     * @param {number} timeout - Maximum time to wait in milliseconds
+     * @returns {Promise} Promise resolving to the transcription result
+     */
+    async waitForTranscription(interval = 1000, timeout = 600000) {
+        const deadline = Date.now() + timeout;
+
+        while (Date.now() < deadline) {
+            const info = await this.getSessionInfo();
+
+            if (!info.success) {
+                return info;
+            }
+
+            const session = info.session;
+
+            if (session.status === 'transcribed') {
+                // Fetch the transcript and up-sots only once they are ready
+                const result = await this.getSessionInfo('transcript,upsots');
+                return result.success ? { success: true, ...result.session } : result;
+            }
+
+            // A job killed by the worker may not have updated the session status
+            if (session.status === 'failed' || session.job_status === 'failed') {
+                return { success: false, error: session.error || 'Transcription failed' };
+            }
+
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+
+        return { success: false, error: 'Timed out waiting for transcription' };
+    }
+
     /**
      * Set parameters for current session
      * @param {Object} parameters - Parameters to set
@@ -270,15 +313,17 @@ class ApiClient {
 
     /**
      * Get information about current session
+     * @param {string} include - Optional large fields to include (e.g. 'transcript,upsots')
      * @returns {Promise} Promise resolving to API response
      */
-    async getSessionInfo() {
+    async getSessionInfo(include = '') {
         if (!this.sessionId) {
             return { success: false, error: 'No active session' };
         }
 
         try {
-            const response = await fetch(`${this.baseUrl}/api/transcription/session-info/${this.sessionId}`);
+            const query = include ? `?include=${encodeURIComponent(include)}` : '';
+            const response = await fetch(`${this.baseUrl}/api/transcription/session-info/${this.sessionId}${query}`);
             
             // Improved error handling for JSON parsing
             try {
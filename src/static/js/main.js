@@ -484,7 +484,7 @@ async function handleGenerateOutput(formats, email) {
             });
             
             if (emailResult.success) {
-                uiControls.updateStatus(`Email sent to ${email}`);
+                uiControls.updateStatus(`Email to ${email} queued for sending`);
             } else {
                 uiControls.updateStatus(`Error sending email: ${emailResult.error || 'Unknown error'}`);
             }
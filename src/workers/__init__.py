@@ -0,0 +1,16 @@
+"""
+Background workers for the Retro Transcription Web Tool
+
+Start a worker from the project root with:
+    rq worker --url $REDIS_URL transcribe email
+"""
+
+import os
+import redis
+from rq import Queue
+
+# RQ stores pickled job payloads, so this connection must not decode responses
+redis_connection = redis.Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+
+transcription_queue = Queue('transcribe', connection=redis_connection)
+email_queue = Queue('email', connection=redis_connection)
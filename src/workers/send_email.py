@@ -0,0 +1,63 @@
+"""
+Background email job for the Retro Transcription Web Tool
+"""
+
+from src.models.transcription.email_service import EmailService
+from src.models.transcription.session_store import SessionStore
+from src.workers import redis_connection
+
+# Initialize components
+email_service = EmailService()
+session_store = SessionStore(redis_connection)
+
+def send_email_job(session_id, recipient_email, subject, body, include_txt=False, include_pdf=False):
+    """
+    Email the output files of a session and record the result in the session
+    
+    Args:
+        session_id (str): Session ID
+        recipient_email (str): Recipient email address
+        subject (str): Email subject
+        body (str): Email body text
+        include_txt (bool): Whether to attach the TXT output
+        include_pdf (bool): Whether to attach the PDF output
+    
+    Returns:
+        dict: Result of the email sending operation
+    """
+    session = session_store.get(session_id)
+    if session is None:
+        return {'success': False, 'error': 'Session not found'}
+    
+    outputs = session.get('outputs') or {}
+    if 'edl' not in outputs:
+        return {'success': False, 'error': 'No EDL output available'}
+    
+    # Get additional attachments
+    additional_attachments = []
+    if include_txt and 'txt' in outputs:
+        additional_attachments.append(outputs['txt']['path'])
+    
+    if include_pdf and 'pdf' in outputs:
+        additional_attachments.append(outputs['pdf']['path'])
+    
+    # Send email
+    result = email_service.send_edl(
+        recipient_email=recipient_email,
+        edl_file_path=outputs['edl']['path'],
+        subject=subject,
+        body=body,
+        additional_attachments=additional_attachments
+    )
+    
+    # Store email result in session
+    def store_email_result(current):
+        if result['success']:
+            current['email_sent'] = result
+            current.pop('email_error', None)
+        else:
+            current['email_error'] = result.get('error', 'Failed to send email')
+    
+    session_store.update(session_id, store_email_result)
+    
+    return result
@@ -0,0 +1,98 @@
+"""
+Background transcription job for the Retro Transcription Web Tool
+"""
+
+from src.models.transcription.audio_processor import AudioProcessor
+from src.models.transcription.session_store import SessionStore
+from src.workers import redis_connection
+
+# Initialize components
+audio_processor = AudioProcessor()
+session_store = SessionStore(redis_connection)
+
+def run_transcription(session_id):
+    """
+    Transcribe the audio for a session and store the results in the session
+    
+    Up-sots are generated from the session's parameters and script at the
+    time the results are stored, so changes made while the job was queued
+    or running are kept.
+    
+    Args:
+        session_id (str): Session ID
+    
+    Returns:
+        dict: Summary of the transcription result
+    """
+    session = session_store.get(session_id)
+    if session is None:
+        return {'success': False, 'error': 'Session not found'}
+    
+    def mark_transcribing(current):
+        current['status'] = 'transcribing'
+    
+    session_store.update(session_id, mark_transcribing)
+    
+    # Transcribe audio
+    result = audio_processor.transcribe_audio(session['audio_file'])
+    
+    if not result['success']:
+        error = result.get('error', 'Transcription failed')
+        
+        def mark_failed(current):
+            current['status'] = 'failed'
+            current['error'] = error
+        
+        session_store.update(session_id, mark_failed)
+        return {'success': False, 'error': error}
+    
+    # Store transcription results and up-sots
+    def store_results(current):
+        # Get up-sots based on the session's current parameters
+        parameters = current['parameters']
+        up_sots = audio_processor.get_up_sots(
+            result['segments'],
+            max_count=parameters['up_sots_count'],
+            sensitivity=parameters['sensitivity'],
+            sort_by_relevance=parameters['sort_by_relevance'],
+            reference_script=current.get('script', '')
+        )
+        
+        current['transcription'] = result
+        current['status'] = 'transcribed'
+        current['up_sots'] = up_sots
+        current['segments_count'] = len(result['segments'])
+        current['up_sots_count'] = len(up_sots)
+        current.pop('up_sots_script_digest', None)
+        current.pop('error', None)
+    
+    session = session_store.update(session_id, store_results)
+    if session is None:
+        return {'success': False, 'error': 'Session not found'}
+    
+    return {
+        'success': True,
+        'segments_count': session['segments_count'],
+        'up_sots_count': session['up_sots_count']
+    }
+
+def mark_transcription_failed(job, connection, exc_type, exc_value, traceback):
+    """
+    RQ failure callback that marks the job's session as failed, so clients
+    stop waiting when the job times out or raises
+    
+    Args:
+        job (rq.job.Job): The failed transcription job
+        connection (redis.Redis): Redis connection of the job
+        exc_type (type): Exception type
+        exc_value (Exception): Exception raised by the job
+        traceback (traceback): Traceback of the exception
+    """
+    session_id = job.args[0]
+    error = str(exc_value) or exc_type.__name__
+    
+    def mark_failed(current):
+        current['status'] = 'failed'
+        current['error'] = error
+    
+    session_store.update(session_id, mark_failed)